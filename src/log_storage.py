@@ -1,7 +1,13 @@
 """Log storage routing and JSONL writing."""
 
+import atexit
+import functools
 import logging
+import os
+import queue
 import string
+import threading
+from collections.abc import Iterable
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
@@ -12,7 +18,7 @@ from mitmproxy import http
 logger = logging.getLogger(__name__)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class StoragePaths:
     """Resolved storage paths for input and output payloads."""
 
@@ -20,46 +26,247 @@ class StoragePaths:
     output_path: Path
 
 
-def append_jsonl(path: Path, payload: Any) -> None:
-    """Append a JSON payload to a JSONL file."""
+# Append descriptors are kept open across writes; the oldest entry is closed
+# once more than this many distinct files have been written.
+_FD_CACHE_MAX_SIZE = 64
+_FD_CACHE: dict[Path, int] = {}
+
 
+def _discard_fd(path: Path) -> None:
+    fd = _FD_CACHE.pop(path, None)
+    if fd is None:
+        return
     try:
+        os.close(fd)
+    except OSError:
+        pass
+
+
+def _open_for_append(path: Path) -> int:
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+    try:
+        return os.open(path, flags, 0o666)
+    except FileNotFoundError:
+        # Only create the parent directory when it is actually missing, so
+        # reopening a file in an existing directory costs a single syscall.
         path.parent.mkdir(parents=True, exist_ok=True)
-        with path.open("ab") as handle:
-            handle.write(orjson.dumps(payload))
-            handle.write(b"\n")
-    except OSError as exc:
-        logger.warning("Failed to write JSONL to %s: %s", path, exc)
+        return os.open(path, flags, 0o666)
+
+
+def _append_fd(path: Path) -> int:
+    fd = _FD_CACHE.get(path)
+    if fd is not None:
+        # Reopen when the file was unlinked behind our back (e.g. the data
+        # directory was cleaned), otherwise writes would go to a dead inode.
+        if os.fstat(fd).st_nlink:
+            return fd
+        _discard_fd(path)
+
+    fd = _open_for_append(path)
+    if len(_FD_CACHE) >= _FD_CACHE_MAX_SIZE:
+        _discard_fd(next(iter(_FD_CACHE)))
+    _FD_CACHE[path] = fd
+    return fd
+
+
+def close_cached_files() -> None:
+    """Close every cached JSONL append descriptor."""
+
+    for path in list(_FD_CACHE):
+        _discard_fd(path)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+# Per-call iovec limit for os.writev; POSIX guarantees at least 16.
+_IOV_MAX = max(os.sysconf("SC_IOV_MAX"), 16) if hasattr(os, "sysconf") else 16
+
+
+def _write_records(fd: int, records: list[bytes]) -> None:
+    """Write *records* back to back, using vectored I/O where available."""
+
+    if not hasattr(os, "writev"):
+        _write_all(fd, b"".join(records))
+        return
+    for start in range(0, len(records), _IOV_MAX):
+        chunk = records[start : start + _IOV_MAX]
+        written = os.writev(fd, chunk)
+        if written < sum(map(len, chunk)):
+            _write_all(fd, b"".join(chunk)[written:])
+
+
+# Records are serialized on the caller's thread and written by a single
+# background thread, so mitmproxy's event loop never blocks on disk I/O.
+# When the queue is full, producers wait rather than drop records.
+_WRITE_QUEUE_MAX_SIZE = 10_000
+_WRITE_QUEUE: queue.Queue[tuple[Path, bytes]] = queue.Queue(_WRITE_QUEUE_MAX_SIZE)
+_writer_lock = threading.Lock()
+_writer_thread: threading.Thread | None = None
+
+
+def _write_batch(batch: list[tuple[Path, bytes]]) -> None:
+    records_by_path: dict[Path, list[bytes]] = {}
+    for path, record in batch:
+        records_by_path.setdefault(path, []).append(record)
+
+    for path, records in records_by_path.items():
+        try:
+            _write_records(_append_fd(path), records)
+        except OSError as exc:
+            _discard_fd(path)
+            logger.warning("Failed to write JSONL to %s: %s", path, exc)
+
+
+def _writer_loop() -> None:
+    while True:
+        batch = [_WRITE_QUEUE.get()]
+        # Drain everything already queued so each file gets a single write.
+        while True:
+            try:
+                batch.append(_WRITE_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write_batch(batch)
+        except Exception:
+            logger.exception("Unexpected error in JSONL writer thread")
+        finally:
+            for _ in batch:
+                _WRITE_QUEUE.task_done()
+
+
+def _ensure_writer() -> None:
+    global _writer_thread
+
+    if _writer_thread is not None:
+        return
+    with _writer_lock:
+        if _writer_thread is None:
+            thread = threading.Thread(
+                target=_writer_loop, name="jsonl-writer", daemon=True
+            )
+            thread.start()
+            _writer_thread = thread
 
 
+def flush_jsonl() -> None:
+    """Block until every queued JSONL record has been written."""
+
+    _WRITE_QUEUE.join()
+
+
+@atexit.register
+def _shutdown_writer() -> None:
+    flush_jsonl()
+    close_cached_files()
+
+
+# Every record ends with a newline; numpy arrays (e.g. embeddings) are
+# serialized natively instead of raising.
+_DUMP_OPTIONS = orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _queue_records(path: Path, records: bytes) -> None:
+    _ensure_writer()
+    _WRITE_QUEUE.put((path, records))
+
+
+def append_jsonl(path: Path, payload: Any) -> None:
+    """Queue a JSON payload to be appended to a JSONL file.
+
+    The record is written asynchronously; use :func:`flush_jsonl` to wait
+    until it has reached the file.
+    """
+
+    _queue_records(path, orjson.dumps(payload, option=_DUMP_OPTIONS))
+
+
+def append_jsonl_many(path: Path, payloads: Iterable[Any]) -> None:
+    """Queue several JSON payloads to be appended to a JSONL file together.
+
+    The records are joined into one buffer, so they reach the file in a
+    single write and are never interleaved with other appends.
+    """
+
+    records = b"".join(
+        orjson.dumps(payload, option=_DUMP_OPTIONS) for payload in payloads
+    )
+    if records:
+        _queue_records(path, records)
+
+
+_SEGMENT_ALLOWED = frozenset((string.ascii_letters + string.digits + "-_.").encode())
+# Byte translation table mapping every disallowed byte to "_".  Non-ASCII
+# characters are encoded to "?" first, so each still becomes a single "_".
+_SEGMENT_TABLE = bytes(
+    byte if byte in _SEGMENT_ALLOWED else ord("_") for byte in range(256)
+)
+
+
+@functools.lru_cache(maxsize=1024)
 def _safe_path_segment(value: str) -> str:
-    allowed = set(string.ascii_letters + string.digits + "-_.")
-    cleaned = "".join(char if char in allowed else "_" for char in value.strip())
-    cleaned = cleaned.strip("._-")
+    encoded = value.strip().encode("ascii", "replace")
+    cleaned = encoded.translate(_SEGMENT_TABLE).decode("ascii").strip("._-")
     return cleaned[:120] or "unknown"
 
 
+def _first_header_value(fields: Iterable[tuple[bytes, bytes]], name: bytes) -> bytes:
+    """Return the first raw value of header *name* (lowercase), or ``b""``."""
+
+    for field_name, value in fields:
+        if field_name.lower() == name:
+            return value
+    return b""
+
+
+# Number of distinct header values whose resolved paths StorageRouter keeps.
+_PATH_CACHE_MAX_SIZE = 256
+
+
 class StorageRouter:
     """Resolve storage paths based on request metadata."""
 
     def __init__(self, data_dir: Path, header_key: str | None = "x-batch-id") -> None:
-        self._data_dir = data_dir
-        self._header_key = header_key.lower() if header_key else None
+        self._requests_dir = data_dir / "requests"
+        self._header_key = header_key.lower().encode("ascii") if header_key else None
+        self._default_paths = StoragePaths(
+            input_path=data_dir / "input.jsonl",
+            output_path=data_dir / "output.jsonl",
+        )
+        # Every request of a batch run carries the same batch id, so resolved
+        # paths are memoized per raw header value.
+        self._path_cache: dict[bytes, StoragePaths] = {}
 
     def resolve(self, flow: http.HTTPFlow) -> StoragePaths:
         """Resolve input/output paths for the given flow."""
 
         if self._header_key:
-            header_value = flow.request.headers.get(self._header_key, "")
+            # Scanning the raw header fields skips the str decoding and
+            # case-folding that Headers.get performs for every header.
+            header_value = _first_header_value(
+                flow.request.headers.fields, self._header_key
+            )
             if header_value:
-                safe_value = _safe_path_segment(header_value)
-                base_dir = self._data_dir / "requests" / safe_value
-                return StoragePaths(
-                    input_path=base_dir / "input.jsonl",
-                    output_path=base_dir / "output.jsonl",
-                )
-
-        return StoragePaths(
-            input_path=self._data_dir / "input.jsonl",
-            output_path=self._data_dir / "output.jsonl",
+                paths = self._path_cache.get(header_value)
+                if paths is None:
+                    paths = self._resolve_header_value(header_value)
+                return paths
+
+        return self._default_paths
+
+    def _resolve_header_value(self, header_value: bytes) -> StoragePaths:
+        # Decode the way mitmproxy does, so ids sanitize exactly as before.
+        batch_id = header_value.decode("utf-8", "surrogateescape")
+        base_dir = os.path.join(self._requests_dir, _safe_path_segment(batch_id))
+        paths = StoragePaths(
+            input_path=Path(base_dir, "input.jsonl"),
+            output_path=Path(base_dir, "output.jsonl"),
         )
+        if len(self._path_cache) >= _PATH_CACHE_MAX_SIZE:
+            del self._path_cache[next(iter(self._path_cache))]
+        self._path_cache[header_value] = paths
+        return paths
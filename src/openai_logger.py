@@ -1,15 +1,18 @@
 """Mitmproxy addon for logging OpenAI-compatible traffic."""
 
+import functools
 import hashlib
-from collections.abc import Iterable
-from dataclasses import dataclass
-from typing import Any, Protocol
+import itertools
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any, Protocol, TypedDict
 
+import msgspec
 import orjson
 from mitmproxy import http
 
 from src.core.config import settings
-from src.log_storage import StoragePaths, StorageRouter, append_jsonl
+from src.log_storage import StoragePaths, StorageRouter, append_jsonl, flush_jsonl
 
 REQUEST_METADATA_KEY = "openai_request_payload"
 STORAGE_METADATA_KEY = "openai_storage_paths"
@@ -37,6 +40,27 @@ _FINGERPRINT_KEYS: tuple[str, ...] = (
 )
 
 
+class _StreamChoice(TypedDict, total=False):
+    index: Any
+    delta: Any
+    finish_reason: Any
+
+
+class _StreamChunk(TypedDict, total=False):
+    """Subset of a chat completion chunk read by the stream aggregator."""
+
+    id: Any
+    created: Any
+    model: Any
+    choices: list[_StreamChoice]
+    usage: Any
+
+
+# Fields outside _StreamChunk (logprobs, token ids, ...) are skipped while
+# decoding rather than materialised; the decoder is reused for every event.
+_STREAM_CHUNK_DECODER: msgspec.json.Decoder[Any] = msgspec.json.Decoder(_StreamChunk)
+
+
 @dataclass(frozen=True)
 class EndpointSpec:
     """Describe an OpenAI-compatible API endpoint."""
@@ -54,12 +78,29 @@ class EndpointRegistry:
 
     def __init__(self, endpoints: Iterable[EndpointSpec]) -> None:
         self._endpoints = list(endpoints)
+        # Flattened in registration order so the first registered endpoint
+        # still wins when several suffixes match.
+        self._suffixes: tuple[str, ...] = tuple(
+            suffix for endpoint in self._endpoints for suffix in endpoint.suffixes
+        )
+        self._endpoint_by_suffix: dict[str, EndpointSpec] = {}
+        for endpoint in self._endpoints:
+            for suffix in endpoint.suffixes:
+                self._endpoint_by_suffix.setdefault(suffix, endpoint)
+        # Benchmarks send the same few paths over and over; the bound keeps
+        # memory flat when clients vary the query string.
+        self._cached_match = functools.lru_cache(maxsize=1024)(self._match)
 
     def match(self, path: str) -> EndpointSpec | None:
+        return self._cached_match(path)
+
+    def _match(self, path: str) -> EndpointSpec | None:
         clean_path = _normalize_path(path)
-        for endpoint in self._endpoints:
-            if any(clean_path.endswith(suffix) for suffix in endpoint.suffixes):
-                return endpoint
+        if not clean_path.endswith(self._suffixes):
+            return None
+        for suffix in self._suffixes:
+            if clean_path.endswith(suffix):
+                return self._endpoint_by_suffix[suffix]
         return None
 
     def supports(self, path: str) -> bool:
@@ -79,11 +120,11 @@ def default_endpoint_registry() -> EndpointRegistry:
     )
 
 
-def read_json(text: str) -> Any | None:
-    """Parse JSON text and return None on decode errors."""
+def read_json(data: bytes | str) -> Any | None:
+    """Parse a JSON document and return None on decode errors."""
 
     try:
-        return orjson.loads(text)
+        return orjson.loads(data)
     except orjson.JSONDecodeError:
         return None
 
@@ -114,53 +155,105 @@ def _normalize_endpoint_url(path: str) -> str:
 def is_event_stream(content_type: str) -> bool:
     """Return True when the response content type indicates SSE."""
 
+    # Servers nearly always send the lower-case media type first, which
+    # avoids lower-casing a copy of the header on the streaming path.
+    if content_type.startswith("text/event-stream"):
+        return True
     return "text/event-stream" in content_type.lower()
 
 
-def parse_sse_events(body_text: str) -> list[dict[str, Any]]:
-    """Parse SSE response text into a list of JSON event payloads."""
+def iter_sse_events(body: bytes) -> Iterator[dict[str, Any]]:
+    """Yield chat completion chunks from a raw SSE response body as they decode.
 
-    events: list[dict[str, Any]] = []
-    for raw_line in body_text.splitlines():
-        line = raw_line.strip()
-        if not line.startswith("data:"):
+    Only the fields consumed by :func:`aggregate_streamed_response` are kept;
+    events that are not JSON objects of that shape are dropped.
+    """
+
+    # Payloads are handed to the decoder as zero-copy views; data lines carrying
+    # base64 images can be several megabytes each.
+    view = memoryview(body)
+    size = len(body)
+    start = 0
+    while start < size:
+        end = body.find(b"\n", start)
+        if end < 0:
+            end = size
+        line_start = start
+        start = end + 1
+        # Match the field name in place so non-data lines are never sliced.
+        if not body.startswith(b"data:", line_start, end):
             continue
-        payload_text = line[5:].strip()
-        if not payload_text:
+        if body[end - 1] == 0x0D:  # tolerate CRLF line endings
+            end -= 1
+        payload_start = line_start + 5
+        if body.startswith(b" ", payload_start, end):
+            payload_start += 1
+        payload_view = view[payload_start:end]
+        if not payload_view:
             continue
-        if payload_text == "[DONE]":
+        if payload_view == b"[DONE]":
             break
-        payload = read_json(payload_text)
-        if isinstance(payload, dict):
-            events.append(payload)
+        try:
+            chunk = _STREAM_CHUNK_DECODER.decode(payload_view)
+        except msgspec.DecodeError:
+            continue
+        yield chunk
+
+
+def parse_sse_events(body: bytes) -> list[dict[str, Any]]:
+    """Parse a raw SSE response body into a list of chat completion chunks."""
+
+    # Every data line contains "data:", so this count is an upper bound and
+    # the list never has to grow while events are decoded.
+    events: list[Any] = [None] * body.count(b"data:")
+    size = 0
+    for event in iter_sse_events(body):
+        events[size] = event
+        size += 1
+    del events[size:]
     return events
 
 
+@dataclass(slots=True)
+class _ChoiceState:
+    """Accumulated state for one choice of a streamed completion."""
+
+    role: Any = None
+    content: list[str] = field(default_factory=list)
+    tool_calls: list[dict[str, Any]] = field(default_factory=list)
+    finish_reason: Any = None
+
+
 def _merge_tool_call(target: dict[str, Any], delta: dict[str, Any]) -> None:
+    # Argument fragments are collected in a list and joined once the stream
+    # has been fully aggregated.
     if "id" in delta:
         target["id"] = delta["id"]
     if "type" in delta:
         target["type"] = delta["type"]
-    if "function" in delta:
-        target.setdefault("function", {})
-        function = target["function"]
-        if "name" in delta["function"]:
-            function["name"] = delta["function"]["name"]
-        if "arguments" in delta["function"]:
-            function["arguments"] = (
-                function.get("arguments", "") + delta["function"]["arguments"]
-            )
+    function_delta = delta.get("function")
+    if function_delta is not None:
+        function = target.setdefault("function", {})
+        if "name" in function_delta:
+            function["name"] = function_delta["name"]
+        if "arguments" in function_delta:
+            function.setdefault("arguments", []).append(function_delta["arguments"])
 
 
 def aggregate_streamed_response(
-    events: list[dict[str, Any]],
+    events: Iterable[dict[str, Any]],
 ) -> dict[str, Any] | None:
-    """Aggregate streamed chat completion events into one response payload."""
+    """Aggregate streamed chat completion events into one response payload.
+
+    *events* is consumed in a single pass, so it may be a lazy iterator such
+    as the one returned by :func:`iter_sse_events`.
+    """
 
-    if not events:
+    event_iter = iter(events)
+    first_event = next(event_iter, None)
+    if first_event is None:
         return None
 
-    first_event = events[0]
     response: dict[str, Any] = {
         "id": first_event.get("id"),
         "object": "chat.completion",
@@ -168,45 +261,78 @@ def aggregate_streamed_response(
         "model": first_event.get("model"),
     }
 
-    choices_state: dict[int, dict[str, Any]] = {}
+    choices_state: dict[int, _ChoiceState] = {}
     usage: dict[str, Any] | None = None
+    events = itertools.chain((first_event,), event_iter)
+
+    # Fast path for the usual stream shape: a single choice at index 0 whose
+    # deltas carry no tool calls.  The first event that does not fit is
+    # handed, together with the rest of the stream, to the general loop.
+    single = _ChoiceState()
+    single_seen = False
+    for event in events:
+        usage_value = event.get("usage")
+        if isinstance(usage_value, dict):
+            usage = usage_value
+        event_choices = event.get("choices")
+        if not event_choices:
+            continue
+        choice = event_choices[0]
+        delta = choice.get("delta", {})
+        if (
+            len(event_choices) != 1
+            or choice.get("index") != 0
+            or not isinstance(delta, dict)
+            or "tool_calls" in delta
+        ):
+            events = itertools.chain((event,), events)
+            break
+
+        single_seen = True
+        finish_reason = choice.get("finish_reason")
+        if finish_reason is not None:
+            single.finish_reason = finish_reason
+        if "role" in delta:
+            single.role = delta["role"]
+        content = delta.get("content")
+        if content is not None:
+            single.content.append(content)
+
+    if single_seen:
+        choices_state[0] = single
 
     for event in events:
-        if isinstance(event.get("usage"), dict):
-            usage = event["usage"]
+        usage_value = event.get("usage")
+        if isinstance(usage_value, dict):
+            usage = usage_value
 
         for choice in event.get("choices", []):
             index = choice.get("index")
             if not isinstance(index, int):
                 continue
-            state = choices_state.setdefault(
-                index,
-                {
-                    "index": index,
-                    "role": None,
-                    "content": "",
-                    "tool_calls": [],
-                    "finish_reason": None,
-                },
-            )
-
-            if "finish_reason" in choice and choice["finish_reason"] is not None:
-                state["finish_reason"] = choice["finish_reason"]
+            state = choices_state.get(index)
+            if state is None:
+                state = choices_state[index] = _ChoiceState()
+
+            finish_reason = choice.get("finish_reason")
+            if finish_reason is not None:
+                state.finish_reason = finish_reason
 
             delta = choice.get("delta", {})
             if not isinstance(delta, dict):
                 continue
 
             if "role" in delta:
-                state["role"] = delta["role"]
-            if "content" in delta and delta["content"] is not None:
-                state["content"] += delta["content"]
+                state.role = delta["role"]
+            content = delta.get("content")
+            if content is not None:
+                state.content.append(content)
 
-            for tool_call in delta.get("tool_calls", []) or []:
+            for tool_call in delta.get("tool_calls") or ():
                 tool_index = tool_call.get("index")
                 if not isinstance(tool_index, int):
                     continue
-                tools = state["tool_calls"]
+                tools = state.tool_calls
                 while len(tools) <= tool_index:
                     tools.append({})
                 _merge_tool_call(tools[tool_index], tool_call)
@@ -215,19 +341,20 @@ def aggregate_streamed_response(
     for index in sorted(choices_state):
         state = choices_state[index]
         message: dict[str, Any] = {
-            "role": state["role"] or "assistant",
+            "role": state.role or "assistant",
         }
-        if state["content"]:
-            message["content"] = state["content"]
-        else:
-            message["content"] = None
-        if state["tool_calls"]:
-            message["tool_calls"] = state["tool_calls"]
+        message["content"] = "".join(state.content) or None
+        if state.tool_calls:
+            for tool_call in state.tool_calls:
+                function = tool_call.get("function")
+                if function is not None and "arguments" in function:
+                    function["arguments"] = "".join(function["arguments"])
+            message["tool_calls"] = state.tool_calls
 
         choice_payload = {
             "index": index,
             "message": message,
-            "finish_reason": state["finish_reason"],
+            "finish_reason": state.finish_reason,
         }
         choices.append(choice_payload)
 
@@ -278,11 +405,11 @@ class OpenAILogger:
         if not self._endpoint_registry.supports(flow.request.path):
             return
 
-        body_text = flow.request.get_text(strict=False)
-        if not body_text:
+        content = flow.request.get_content(strict=False)
+        if not content:
             return
 
-        payload = read_json(body_text)
+        payload = read_json(content)
         if not isinstance(payload, dict):
             return
 
@@ -316,18 +443,17 @@ class OpenAILogger:
         if not isinstance(storage_paths, StoragePaths):
             return
 
-        body_text = flow.response.get_text(strict=False)
-        if not body_text:
+        content = flow.response.get_content(strict=False)
+        if not content:
             return
 
         content_type = flow.response.headers.get("content-type", "")
         if is_event_stream(content_type):
-            events = parse_sse_events(body_text)
-            body_payload = aggregate_streamed_response(events)
+            body_payload = aggregate_streamed_response(iter_sse_events(content))
             if body_payload is None:
                 return
         else:
-            body_payload = read_json(body_text)
+            body_payload = read_json(content)
             if body_payload is None:
                 return
 
@@ -350,5 +476,8 @@ class OpenAILogger:
         }
         append_jsonl(storage_paths.output_path, batch_output)
 
+    def done(self) -> None:
+        flush_jsonl()
+
 
 addons = [OpenAILogger()]
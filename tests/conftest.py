@@ -2,11 +2,20 @@
 
 from __future__ import annotations
 
-from collections.abc import Callable
+import shutil
+import tempfile
+from collections.abc import Callable, Generator
 from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
 
 import pytest
 
+from src.log_storage import StoragePaths, _safe_path_segment
+from src.openai_logger import EndpointRegistry, EndpointSpec
+
+AppendCall = tuple[Path, Any]
+
 
 class DummyHeaders:
     def __init__(self, initial: dict[str, str] | None = None) -> None:
@@ -21,6 +30,13 @@ class DummyHeaders:
     def set(self, key: str, value: str) -> None:
         self._values[key.lower()] = value
 
+    @property
+    def fields(self) -> tuple[tuple[bytes, bytes], ...]:
+        return tuple(
+            (key.encode("utf-8"), value.encode("utf-8"))
+            for key, value in self._values.items()
+        )
+
 
 @dataclass
 class DummyRequest:
@@ -32,6 +48,9 @@ class DummyRequest:
     def get_text(self, strict: bool = False) -> str:
         return self.body_text
 
+    def get_content(self, strict: bool = False) -> bytes:
+        return self.body_text.encode("utf-8")
+
 
 @dataclass
 class DummyResponse:
@@ -42,6 +61,9 @@ class DummyResponse:
     def get_text(self, strict: bool = False) -> str:
         return self.body_text
 
+    def get_content(self, strict: bool = False) -> bytes:
+        return self.body_text.encode("utf-8")
+
 
 @dataclass
 class DummyFlow:
@@ -55,6 +77,22 @@ def anyio_backend() -> str:
     return "asyncio"
 
 
+@pytest.fixture(scope="session")
+def fast_tmp(tmp_path_factory: pytest.TempPathFactory) -> Generator[Path]:
+    """Session-wide scratch directory, on tmpfs when /dev/shm is available.
+
+    Tests sharing it must use distinct file names.
+    """
+
+    shm = Path("/dev/shm")
+    if not shm.is_dir():
+        yield tmp_path_factory.mktemp("fast")
+        return
+    path = Path(tempfile.mkdtemp(prefix="llm-batch-", dir=shm))
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
 @pytest.fixture
 def make_flow() -> Callable[..., DummyFlow]:
     def _make_flow(
@@ -79,3 +117,53 @@ def make_flow() -> Callable[..., DummyFlow]:
         return DummyFlow(request=request, response=response)
 
     return _make_flow
+
+
+@pytest.fixture(scope="session")
+def endpoint_registry() -> EndpointRegistry:
+    """Chat completions registry shared by every logger test."""
+
+    return EndpointRegistry(
+        endpoints=(
+            EndpointSpec(name="chat.completions", suffixes=("/chat/completions",)),
+        )
+    )
+
+
+@pytest.fixture
+def clear_path_segment_cache() -> Generator[None]:
+    """Start and end the test with an empty _safe_path_segment cache."""
+
+    _safe_path_segment.cache_clear()
+    yield
+    _safe_path_segment.cache_clear()
+
+
+@pytest.fixture
+def storage_paths(tmp_path: Path) -> StoragePaths:
+    return StoragePaths(
+        input_path=tmp_path / "input.jsonl",
+        output_path=tmp_path / "output.jsonl",
+    )
+
+
+@pytest.fixture
+def record_calls() -> tuple[list[AppendCall], Callable[[Path, Any], None]]:
+    calls: list[AppendCall] = []
+
+    def record(path: Path, payload: Any) -> None:
+        calls.append((path, payload))
+
+    return calls, record
+
+
+@pytest.fixture
+def patched_append_jsonl(
+    monkeypatch: pytest.MonkeyPatch,
+    record_calls: tuple[list[AppendCall], Callable[[Path, Any], None]],
+) -> list[AppendCall]:
+    """Replace the logger's append_jsonl and return the recorded calls."""
+
+    calls, record = record_calls
+    monkeypatch.setattr("src.openai_logger.append_jsonl", record)
+    return calls
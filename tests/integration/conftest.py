@@ -9,28 +9,43 @@ from pathlib import Path
 
 import pytest
 
-logger = logging.getLogger(__name__)
+from .helpers import (
+    NO_COMPOSE_CLI_REASON,
+    ComposeShell,
+    compose_cli,
+    find_compose_cli,
+)
 
-# Compose CLI executable (docker or podman).
-_COMPOSE_CLI = shutil.which("docker") or shutil.which("podman") or "docker"
+logger = logging.getLogger(__name__)
 
 
 def pytest_collection_modifyitems(
     config: pytest.Config, items: list[pytest.Item]
 ) -> None:
-    """Skip integration tests unless RUN_INTEGRATION=1."""
+    """Skip integration tests unless RUN_INTEGRATION=1 and a compose CLI exists."""
     _ = config
-    if os.getenv("RUN_INTEGRATION") == "1":
+    if os.getenv("RUN_INTEGRATION") != "1":
+        reason = "Integration tests are disabled. Set RUN_INTEGRATION=1."
+    elif find_compose_cli() is None:
+        reason = NO_COMPOSE_CLI_REASON
+    else:
         return
 
-    skip_marker = pytest.mark.skip(
-        reason="Integration tests are disabled. Set RUN_INTEGRATION=1."
-    )
+    skip_marker = pytest.mark.skip(reason=reason)
     for item in items:
         if "integration" in item.keywords:
             item.add_marker(skip_marker)
 
 
+@pytest.fixture(scope="session")  # type: ignore[misc]
+def compose_shell() -> Generator[ComposeShell]:
+    """Share one exec session in the batch container across the test session."""
+
+    shell = ComposeShell()
+    yield shell
+    shell.close()
+
+
 @pytest.fixture(autouse=True)  # type: ignore[misc]
 def clean_data_directory() -> Generator[None]:
     """Clean the data directory before and after each integration test."""
@@ -66,7 +81,7 @@ def _container_rm(data_dir: Path) -> None:
     """Remove data directory contents via the batch container."""
     result = subprocess.run(
         [
-            _COMPOSE_CLI,
+            compose_cli(),
             "compose",
             "-f",
             "compose.yaml",
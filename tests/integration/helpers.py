@@ -2,29 +2,56 @@
 
 from __future__ import annotations
 
-import json
+import functools
+import mmap
+import shlex
 import shutil
 import subprocess
+import tempfile
+from collections.abc import Sequence
 from pathlib import Path
-from typing import Any
+from typing import IO, Any
 
-# docker might not be installed locally (e.g. when using podman with an alias).
-# subprocess calls don't respect shell aliases, so we dynamically choose the
-# executable based on what's available in PATH.  This mirrors the Github
-# Actions environment where `docker` is guaranteed and keeps tests portable.
-_COMPOSE_CLI = shutil.which("docker") or shutil.which("podman") or "docker"
+import orjson
+import pytest
 
-DOCKER_COMPOSE_EXEC_PREFIX = [
-    _COMPOSE_CLI,
+NO_COMPOSE_CLI_REASON = "Neither docker nor podman was found on PATH."
+
+
+@functools.cache
+def find_compose_cli() -> str | None:
+    """Return the compose CLI executable (docker or podman), if installed.
+
+    docker might not be installed locally (e.g. when using podman with an
+    alias).  subprocess calls don't respect shell aliases, so we choose the
+    executable based on what's available in PATH.  This mirrors the Github
+    Actions environment where `docker` is guaranteed and keeps tests portable.
+    The lookup only runs once integration tests are enabled and is cached
+    for the rest of the session.
+    """
+
+    return shutil.which("docker") or shutil.which("podman")
+
+
+def compose_cli() -> str:
+    """Return the compose CLI executable, failing if neither is installed."""
+
+    cli = find_compose_cli()
+    if cli is None:
+        raise RuntimeError(NO_COMPOSE_CLI_REASON)
+    return cli
+
+
+DOCKER_COMPOSE_EXEC_ARGS = (
     "compose",
     "-f",
     "compose.yaml",
     "exec",
     "-T",
     "batch",
-]
+)
 
-VLLM_BENCH_BASE_ARGS = [
+VLLM_BENCH_BASE_ARGS = (
     "vllm",
     "bench",
     "serve",
@@ -42,27 +69,107 @@ VLLM_BENCH_BASE_ARGS = [
     "2",
     "--max-concurrency",
     "2",
-]
+)
+
+
+# Printed after every command sent to ComposeShell; carries the exit code.
+_END_MARKER = b"__LLM_BATCH_COMMAND_END__"
+
+
+class ComposeShell:
+    """Long-lived bash session inside the batch container.
+
+    Entering the container with ``docker compose exec`` costs a noticeable
+    fraction of a second, so integration tests share one session and feed
+    it commands over stdin instead of spawning an exec per test.
+    """
+
+    def __init__(self) -> None:
+        self._process = subprocess.Popen(
+            [compose_cli(), *DOCKER_COMPOSE_EXEC_ARGS, "bash"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+
+    def run(self, command: Sequence[str], output: IO[bytes]) -> int:
+        """Run *command* in the session and return its exit code.
+
+        Output is streamed into *output* as raw bytes rather than collected
+        in memory, since it is only inspected when the command fails.
+        """
+
+        stdin = self._process.stdin
+        stdout = self._process.stdout
+        assert stdin is not None and stdout is not None
+        # stdin is redirected so the command cannot swallow the commands
+        # queued after it; the marker goes on its own line in case the
+        # command output does not end with a newline.
+        stdin.write(
+            f"{shlex.join(command)} 2>&1 </dev/null; "
+            f"printf '\\n{_END_MARKER.decode()}%d\\n' $?\n".encode()
+        )
+        stdin.flush()
+
+        for line in stdout:
+            if line.startswith(_END_MARKER):
+                return int(line[len(_END_MARKER) :])
+            output.write(line)
+        raise RuntimeError("Compose shell exited unexpectedly.")
+
+    def close(self) -> None:
+        """End the session and wait for the exec process to exit."""
+
+        if self._process.stdin is not None:
+            self._process.stdin.close()
+        try:
+            self._process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+
+def build_bench_command(*extra_args: str) -> tuple[str, ...]:
+    """Build a benchmark command to run inside the batch container."""
 
+    return VLLM_BENCH_BASE_ARGS + extra_args
 
-def build_bench_command(*extra_args: str) -> list[str]:
-    """Build a complete docker-compose benchmark command."""
 
-    return [*DOCKER_COMPOSE_EXEC_PREFIX, *VLLM_BENCH_BASE_ARGS, *extra_args]
+def run_bench_command(shell: ComposeShell, command: Sequence[str]) -> None:
+    """Run a benchmark command and fail with a short report on error.
 
+    Output is only kept when the command fails: the failure message names
+    the log file holding all of it and repeats the last few lines.
+    """
 
-def run_bench_command(command: list[str]) -> None:
-    """Run a benchmark command and fail with rich diagnostics on error."""
+    with tempfile.NamedTemporaryFile(
+        prefix="llm-batch-bench-", suffix=".log", delete=False
+    ) as output:
+        returncode = shell.run(command, output)
+    log_path = Path(output.name)
+    if returncode == 0:
+        log_path.unlink()
+        return
 
-    completed = subprocess.run(command, check=False, capture_output=True, text=True)
-    assert completed.returncode == 0, (
-        "Command failed with non-zero exit code.\n"
-        f"command={' '.join(command)}\n"
-        f"stdout:\n{completed.stdout}\n"
-        f"stderr:\n{completed.stderr}"
+    pytest.fail(
+        f"Command failed with exit code {returncode}: {shlex.join(command)}\n"
+        f"full output: {log_path}\n"
+        f"{_tail_lines(log_path, _FAILURE_TAIL_LINES)}",
+        pytrace=False,
     )
 
 
+# Lines of bench output repeated in a failure message.
+_FAILURE_TAIL_LINES = 20
+
+
+def _tail_lines(path: Path, count: int) -> str:
+    """Return the last *count* lines of a captured output file."""
+
+    lines = path.read_bytes().decode("utf-8", "replace").splitlines()
+    return "\n".join(lines[-count:])
+
+
 def output_path(batch_id: str | None = None) -> Path:
     """Return the expected output path for a benchmark run."""
 
@@ -84,12 +191,25 @@ def assert_and_load_jsonl(path: Path) -> list[dict[str, Any]]:
     )
 
     records: list[dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as handle:
-        for line in handle:
-            line = line.strip()
-            if not line:
+    # Map the file instead of reading it so large benchmark outputs are
+    # paged in by the OS rather than copied into one bytes object.
+    with (
+        path.open("rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+    ):
+        size = len(data)
+        start = 0
+        while start < size:
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = size
+            # orjson tolerates surrounding whitespace, so only blank lines
+            # need to be skipped.
+            line = data[start:end]
+            start = end + 1
+            if not line or line.isspace():
                 continue
-            item = json.loads(line)
+            item = orjson.loads(line)
             assert isinstance(item, dict), "Each JSONL line must be a JSON object."
             records.append(item)
 
@@ -97,6 +217,10 @@ def assert_and_load_jsonl(path: Path) -> list[dict[str, Any]]:
     return records
 
 
+# A chat completion choice carries its content under one of these keys.
+_CHOICE_CONTENT_KEYS = frozenset(("message", "delta", "text"))
+
+
 def assert_chat_completion_payloads(records: list[dict[str, Any]]) -> None:
     """Validate the basic schema of Batch API chat completion output records."""
 
@@ -118,6 +242,6 @@ def assert_chat_completion_payloads(records: list[dict[str, Any]]) -> None:
         )
         first_choice = choices[0]
         assert isinstance(first_choice, dict), "Expected each choice to be an object."
-        assert any(key in first_choice for key in ("message", "delta", "text")), (
+        assert not _CHOICE_CONTENT_KEYS.isdisjoint(first_choice), (
             "Expected message content field in first choice."
         )
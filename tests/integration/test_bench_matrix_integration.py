@@ -0,0 +1,125 @@
+"""Integration validation for benchmark output across dataset variants."""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import orjson
+import pytest
+
+from .helpers import (
+    ComposeShell,
+    assert_and_load_jsonl,
+    assert_chat_completion_payloads,
+    build_bench_command,
+    output_path,
+    run_bench_command,
+)
+
+_CUSTOM_DATASET_PATH = Path("data") / "integration_custom_prompts.jsonl"
+_SHAREGPT_DATASET_PATH = Path("data") / "ShareGPT_V3_unfiltered_cleaned_split.json"
+
+
+def _write_custom_dataset(dataset_path: Path) -> None:
+    """Create a minimal valid custom JSONL dataset with two prompts."""
+
+    rows = [
+        {"prompt": "Write a one-line greeting.", "output_tokens": 16},
+        {"prompt": "List two colors.", "output_tokens": 16},
+    ]
+    with dataset_path.open("wb") as dataset_file:
+        for row in rows:
+            dataset_file.write(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE))
+
+
+def _write_sharegpt_dataset(dataset_path: Path) -> None:
+    """Create a minimal ShareGPT-style dataset with two conversations."""
+
+    dataset_path.parent.mkdir(parents=True, exist_ok=True)
+    rows = [
+        {
+            "id": "sharegpt-integration-1",
+            "conversations": [
+                {"from": "human", "value": "Give me a short greeting."},
+                {"from": "assistant", "value": "Hello!"},
+            ],
+        },
+        {
+            "id": "sharegpt-integration-2",
+            "conversations": [
+                {"from": "human", "value": "Name two animals."},
+                {"from": "assistant", "value": "Cat and dog."},
+            ],
+        },
+    ]
+    dataset_path.write_bytes(orjson.dumps(rows))
+
+
+@dataclass(frozen=True)
+class BenchCase:
+    """One dataset variant of the benchmark matrix."""
+
+    bench_args: tuple[str, ...]
+    dataset_path: Path | None = None
+    write_dataset: Callable[[Path], None] | None = None
+    batch_id: str | None = None
+
+
+_BENCH_CASES = [
+    pytest.param(
+        BenchCase(bench_args=("--dataset-name", "random")),
+        id="random",
+    ),
+    pytest.param(
+        BenchCase(
+            bench_args=(
+                "--skip-chat-template",
+                "--dataset-name",
+                "custom",
+                "--dataset-path",
+                f"/app/data/{_CUSTOM_DATASET_PATH.name}",
+            ),
+            dataset_path=_CUSTOM_DATASET_PATH,
+            write_dataset=_write_custom_dataset,
+        ),
+        id="custom",
+    ),
+    pytest.param(
+        BenchCase(
+            bench_args=(
+                "--skip-chat-template",
+                "--dataset-name",
+                "sharegpt",
+                "--dataset-path",
+                f"/app/data/{_SHAREGPT_DATASET_PATH.name}",
+                "--header",
+                "x-batch-id=sharegpt",
+            ),
+            dataset_path=_SHAREGPT_DATASET_PATH,
+            write_dataset=_write_sharegpt_dataset,
+            batch_id="sharegpt",
+        ),
+        id="sharegpt-x-batch-id",
+    ),
+]
+
+
+@pytest.mark.integration  # type: ignore[misc]
+@pytest.mark.xdist_group("compose_output")  # type: ignore[misc]
+@pytest.mark.parametrize("case", _BENCH_CASES)  # type: ignore[misc]
+def test_bench_matrix_output(compose_shell: ComposeShell, case: BenchCase) -> None:
+    """Run one dataset variant through the shared shell and validate its output.
+
+    The sharegpt variant also sends an x-batch-id header, so its output must
+    be routed to the per-batch request subdirectory.
+    """
+
+    if case.write_dataset is not None and case.dataset_path is not None:
+        case.write_dataset(case.dataset_path)
+
+    command = build_bench_command(*case.bench_args)
+    run_bench_command(compose_shell, command)
+
+    records = assert_and_load_jsonl(output_path(batch_id=case.batch_id))
+    assert len(records) == 2, "Expected exactly 2 output records for --num-prompts=2."
+    assert_chat_completion_payloads(records)
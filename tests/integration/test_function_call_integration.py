@@ -5,9 +5,11 @@ from __future__ import annotations
 import json
 from pathlib import Path
 
+import orjson
 import pytest
 
 from .helpers import (
+    ComposeShell,
     assert_and_load_jsonl,
     assert_chat_completion_payloads,
     build_bench_command,
@@ -33,13 +35,15 @@ def _write_tool_dataset(dataset_path: Path) -> list[dict[str, str]]:
         },
     ]
     rows = [{"prompt": sample["prompt"], "output_tokens": 64} for sample in samples]
-    content = "\n".join(json.dumps(row) for row in rows) + "\n"
-    dataset_path.write_text(content, encoding="utf-8")
+    with dataset_path.open("wb") as dataset_file:
+        for row in rows:
+            dataset_file.write(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE))
     return samples
 
 
 @pytest.mark.integration  # type: ignore[misc]
-def test_tool_calls_are_logged_with_arguments() -> None:
+@pytest.mark.xdist_group("compose_output")  # type: ignore[misc]
+def test_tool_calls_are_logged_with_arguments(compose_shell: ComposeShell) -> None:
     """Run benchmark with tool use and validate tool call responses."""
 
     dataset_path = Path("data") / "integration_tool_calls.jsonl"
@@ -91,7 +95,7 @@ def test_tool_calls_are_logged_with_arguments() -> None:
         json.dumps(tools_body),
     )
 
-    run_bench_command(command)
+    run_bench_command(compose_shell, command)
 
     records = assert_and_load_jsonl(output_path())
     assert len(records) == 2, "Expected exactly 2 output records for --num-prompts=2."
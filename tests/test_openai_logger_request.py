@@ -13,7 +13,6 @@ from src.openai_logger import (
     REQUEST_METADATA_KEY,
     STORAGE_METADATA_KEY,
     EndpointRegistry,
-    EndpointSpec,
     OpenAILogger,
     compute_custom_id,
 )
@@ -30,15 +29,9 @@ class DummyStorageRouter(StorageRouter):
         return self.paths
 
 
-def build_registry() -> EndpointRegistry:
-    return EndpointRegistry(
-        endpoints=(
-            EndpointSpec(name="chat.completions", suffixes=("/chat/completions",)),
-        )
-    )
-
-
-def test_request_skips_non_post(make_flow, monkeypatch: pytest.MonkeyPatch) -> None:
+def test_request_skips_non_post(
+    make_flow, endpoint_registry: EndpointRegistry, monkeypatch: pytest.MonkeyPatch
+) -> None:
     flow = make_flow(method="GET", request_body='{"key": "value"}')
     calls: list[tuple[Path, object]] = []
 
@@ -47,7 +40,7 @@ def test_request_skips_non_post(make_flow, monkeypatch: pytest.MonkeyPatch) -> N
 
     monkeypatch.setattr("src.openai_logger.append_jsonl", record)
 
-    logger = OpenAILogger(endpoint_registry=build_registry())
+    logger = OpenAILogger(endpoint_registry=endpoint_registry)
     logger.request(flow)
 
     assert calls == []
@@ -55,7 +48,7 @@ def test_request_skips_non_post(make_flow, monkeypatch: pytest.MonkeyPatch) -> N
 
 
 def test_request_skips_unsupported_path(
-    make_flow, monkeypatch: pytest.MonkeyPatch
+    make_flow, endpoint_registry: EndpointRegistry, monkeypatch: pytest.MonkeyPatch
 ) -> None:
     flow = make_flow(path="/other", request_body='{"key": "value"}')
     calls: list[tuple[Path, object]] = []
@@ -64,14 +57,16 @@ def test_request_skips_unsupported_path(
         "src.openai_logger.append_jsonl", lambda *_: calls.append((Path("x"), {}))
     )
 
-    logger = OpenAILogger(endpoint_registry=build_registry())
+    logger = OpenAILogger(endpoint_registry=endpoint_registry)
     logger.request(flow)
 
     assert calls == []
     assert REQUEST_METADATA_KEY not in flow.metadata
 
 
-def test_request_skips_empty_body(make_flow, monkeypatch: pytest.MonkeyPatch) -> None:
+def test_request_skips_empty_body(
+    make_flow, endpoint_registry: EndpointRegistry, monkeypatch: pytest.MonkeyPatch
+) -> None:
     flow = make_flow(request_body="")
     calls: list[tuple[Path, object]] = []
 
@@ -79,13 +74,15 @@ def test_request_skips_empty_body(make_flow, monkeypatch: pytest.MonkeyPatch) ->
         "src.openai_logger.append_jsonl", lambda *_: calls.append((Path("x"), {}))
     )
 
-    logger = OpenAILogger(endpoint_registry=build_registry())
+    logger = OpenAILogger(endpoint_registry=endpoint_registry)
     logger.request(flow)
 
     assert calls == []
 
 
-def test_request_skips_invalid_json(make_flow, monkeypatch: pytest.MonkeyPatch) -> None:
+def test_request_skips_invalid_json(
+    make_flow, endpoint_registry: EndpointRegistry, monkeypatch: pytest.MonkeyPatch
+) -> None:
     flow = make_flow(request_body="not json")
     calls: list[tuple[Path, object]] = []
 
@@ -93,14 +90,14 @@ def test_request_skips_invalid_json(make_flow, monkeypatch: pytest.MonkeyPatch)
         "src.openai_logger.append_jsonl", lambda *_: calls.append((Path("x"), {}))
     )
 
-    logger = OpenAILogger(endpoint_registry=build_registry())
+    logger = OpenAILogger(endpoint_registry=endpoint_registry)
     logger.request(flow)
 
     assert calls == []
 
 
 def test_request_skips_non_object_json(
-    make_flow, monkeypatch: pytest.MonkeyPatch
+    make_flow, endpoint_registry: EndpointRegistry, monkeypatch: pytest.MonkeyPatch
 ) -> None:
     flow = make_flow(request_body="[]")
     calls: list[tuple[Path, object]] = []
@@ -109,14 +106,14 @@ def test_request_skips_non_object_json(
         "src.openai_logger.append_jsonl", lambda *_: calls.append((Path("x"), {}))
     )
 
-    logger = OpenAILogger(endpoint_registry=build_registry())
+    logger = OpenAILogger(endpoint_registry=endpoint_registry)
     logger.request(flow)
 
     assert calls == []
 
 
 def test_request_skips_when_preprocessor_returns_none(
-    make_flow, monkeypatch: pytest.MonkeyPatch
+    make_flow, endpoint_registry: EndpointRegistry, monkeypatch: pytest.MonkeyPatch
 ) -> None:
     flow = make_flow(request_body='{"key": "value"}')
     calls: list[tuple[Path, object]] = []
@@ -130,7 +127,7 @@ def test_request_skips_when_preprocessor_returns_none(
     )
 
     logger = OpenAILogger(
-        endpoint_registry=build_registry(),
+        endpoint_registry=endpoint_registry,
         request_preprocessors=[preprocessor],
     )
     logger.request(flow)
@@ -140,7 +137,10 @@ def test_request_skips_when_preprocessor_returns_none(
 
 
 def test_request_records_payload_and_metadata(
-    make_flow, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    make_flow,
+    endpoint_registry: EndpointRegistry,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
 ) -> None:
     flow = make_flow(request_body='{"key": "value"}')
     calls: list[tuple[Path, object]] = []
@@ -161,7 +161,7 @@ def test_request_records_payload_and_metadata(
     monkeypatch.setattr("src.openai_logger.append_jsonl", record)
 
     logger = OpenAILogger(
-        endpoint_registry=build_registry(),
+        endpoint_registry=endpoint_registry,
         storage_router=router,
         request_preprocessors=[preprocessor],
     )
@@ -187,7 +187,10 @@ def test_request_records_payload_and_metadata(
 
 
 def test_request_strips_stream_and_stream_options(
-    make_flow, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    make_flow,
+    endpoint_registry: EndpointRegistry,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
 ) -> None:
     """Batch body must not contain stream / stream_options."""
     payload_with_stream = {
@@ -204,7 +207,7 @@ def test_request_strips_stream_and_stream_options(
         lambda path, payload: calls.append((path, payload)),
     )
     logger = OpenAILogger(
-        endpoint_registry=build_registry(),
+        endpoint_registry=endpoint_registry,
         storage_router=DummyStorageRouter(
             StoragePaths(
                 input_path=tmp_path / "input.jsonl",
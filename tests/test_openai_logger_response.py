@@ -2,11 +2,6 @@
 
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Any
-
-import pytest
-
 from src.log_storage import StoragePaths
 from src.openai_logger import (
     CUSTOM_ID_METADATA_KEY,
@@ -17,85 +12,57 @@ from src.openai_logger import (
 
 
 def test_response_skips_without_request_metadata(
-    make_flow, monkeypatch: pytest.MonkeyPatch
+    make_flow, patched_append_jsonl
 ) -> None:
     flow = make_flow(response_body='{"key": "value"}')
-    calls: list[tuple[Path, Any]] = []
-
-    monkeypatch.setattr(
-        "src.openai_logger.append_jsonl", lambda *_: calls.append((Path("x"), {}))
-    )
 
     logger = OpenAILogger()
     logger.response(flow)
 
-    assert calls == []
+    assert patched_append_jsonl == []
 
 
-def test_response_skips_invalid_storage_paths(
-    make_flow, monkeypatch: pytest.MonkeyPatch
-) -> None:
+def test_response_skips_invalid_storage_paths(make_flow, patched_append_jsonl) -> None:
     flow = make_flow(response_body='{"key": "value"}')
     flow.metadata[REQUEST_METADATA_KEY] = {"key": "value"}
     flow.metadata[STORAGE_METADATA_KEY] = "not paths"
-    calls: list[tuple[Path, Any]] = []
-
-    monkeypatch.setattr(
-        "src.openai_logger.append_jsonl", lambda *_: calls.append((Path("x"), {}))
-    )
 
     logger = OpenAILogger()
     logger.response(flow)
 
-    assert calls == []
+    assert patched_append_jsonl == []
 
 
 def test_response_skips_empty_body(
-    make_flow, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    make_flow, patched_append_jsonl, storage_paths: StoragePaths
 ) -> None:
     flow = make_flow(response_body="")
     flow.metadata[REQUEST_METADATA_KEY] = {}
-    flow.metadata[STORAGE_METADATA_KEY] = StoragePaths(
-        input_path=tmp_path / "input.jsonl",
-        output_path=tmp_path / "output.jsonl",
-    )
-    calls: list[tuple[Path, Any]] = []
-
-    monkeypatch.setattr(
-        "src.openai_logger.append_jsonl", lambda *_: calls.append((Path("x"), {}))
-    )
+    flow.metadata[STORAGE_METADATA_KEY] = storage_paths
 
     logger = OpenAILogger()
     logger.response(flow)
 
-    assert calls == []
+    assert patched_append_jsonl == []
 
 
 def test_response_skips_invalid_json(
-    make_flow, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    make_flow, patched_append_jsonl, storage_paths: StoragePaths
 ) -> None:
     flow = make_flow(
         response_body="not json", response_headers={"content-type": "application/json"}
     )
     flow.metadata[REQUEST_METADATA_KEY] = {}
-    flow.metadata[STORAGE_METADATA_KEY] = StoragePaths(
-        input_path=tmp_path / "input.jsonl",
-        output_path=tmp_path / "output.jsonl",
-    )
-    calls: list[tuple[Path, Any]] = []
-
-    monkeypatch.setattr(
-        "src.openai_logger.append_jsonl", lambda *_: calls.append((Path("x"), {}))
-    )
+    flow.metadata[STORAGE_METADATA_KEY] = storage_paths
 
     logger = OpenAILogger()
     logger.response(flow)
 
-    assert calls == []
+    assert patched_append_jsonl == []
 
 
 def test_response_writes_json_payload(
-    make_flow, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    make_flow, patched_append_jsonl, storage_paths: StoragePaths
 ) -> None:
     flow = make_flow(
         response_body='{"status": "ok"}',
@@ -103,24 +70,14 @@ def test_response_writes_json_payload(
     )
     flow.metadata[REQUEST_METADATA_KEY] = {}
     flow.metadata[CUSTOM_ID_METADATA_KEY] = "req-abc123"
-    paths = StoragePaths(
-        input_path=tmp_path / "input.jsonl",
-        output_path=tmp_path / "output.jsonl",
-    )
-    flow.metadata[STORAGE_METADATA_KEY] = paths
-    calls: list[tuple[Path, Any]] = []
-
-    monkeypatch.setattr(
-        "src.openai_logger.append_jsonl",
-        lambda path, payload: calls.append((path, payload)),
-    )
+    flow.metadata[STORAGE_METADATA_KEY] = storage_paths
 
     logger = OpenAILogger()
     logger.response(flow)
 
-    assert len(calls) == 1
-    assert calls[0][0] == paths.output_path
-    out = calls[0][1]
+    assert len(patched_append_jsonl) == 1
+    assert patched_append_jsonl[0][0] == storage_paths.output_path
+    out = patched_append_jsonl[0][1]
     assert out["id"] == "batch_req_req-abc123"
     assert out["custom_id"] == "req-abc123"
     assert out["response"] == {"status_code": 200, "body": {"status": "ok"}}
@@ -128,7 +85,7 @@ def test_response_writes_json_payload(
 
 
 def test_response_writes_sse_aggregate(
-    make_flow, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    make_flow, patched_append_jsonl, storage_paths: StoragePaths
 ) -> None:
     body = "\n".join(
         [
@@ -142,24 +99,14 @@ def test_response_writes_sse_aggregate(
     )
     flow.metadata[REQUEST_METADATA_KEY] = {}
     flow.metadata[CUSTOM_ID_METADATA_KEY] = "req-sse999"
-    paths = StoragePaths(
-        input_path=tmp_path / "input.jsonl",
-        output_path=tmp_path / "output.jsonl",
-    )
-    flow.metadata[STORAGE_METADATA_KEY] = paths
-    calls: list[tuple[Path, Any]] = []
-
-    monkeypatch.setattr(
-        "src.openai_logger.append_jsonl",
-        lambda path, payload: calls.append((path, payload)),
-    )
+    flow.metadata[STORAGE_METADATA_KEY] = storage_paths
 
     logger = OpenAILogger()
     logger.response(flow)
 
-    assert len(calls) == 1
-    assert calls[0][0] == paths.output_path
-    out = calls[0][1]
+    assert len(patched_append_jsonl) == 1
+    assert patched_append_jsonl[0][0] == storage_paths.output_path
+    out = patched_append_jsonl[0][1]
     assert out["custom_id"] == "req-sse999"
     assert out["error"] is None
     assert out["response"]["status_code"] == 200
@@ -167,24 +114,16 @@ def test_response_writes_sse_aggregate(
 
 
 def test_response_skips_empty_sse(
-    make_flow, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    make_flow, patched_append_jsonl, storage_paths: StoragePaths
 ) -> None:
     flow = make_flow(
         response_body="data: [DONE]",
         response_headers={"content-type": "text/event-stream"},
     )
     flow.metadata[REQUEST_METADATA_KEY] = {}
-    flow.metadata[STORAGE_METADATA_KEY] = StoragePaths(
-        input_path=tmp_path / "input.jsonl",
-        output_path=tmp_path / "output.jsonl",
-    )
-    calls: list[tuple[Path, Any]] = []
-
-    monkeypatch.setattr(
-        "src.openai_logger.append_jsonl", lambda *_: calls.append((Path("x"), {}))
-    )
+    flow.metadata[STORAGE_METADATA_KEY] = storage_paths
 
     logger = OpenAILogger()
     logger.response(flow)
 
-    assert calls == []
+    assert patched_append_jsonl == []
@@ -2,24 +2,33 @@
 
 from __future__ import annotations
 
-from src.openai_logger import read_json
+from typing import Any
 
+import pytest
 
-def test_read_json_valid_object() -> None:
-    result = read_json('{"key": "value"}')
-    assert result == {"key": "value"}
+from src.openai_logger import EndpointRegistry, EndpointSpec, read_json
 
 
-def test_read_json_invalid() -> None:
-    result = read_json("invalid json")
-    assert result is None
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    [
+        ('{"key": "value"}', {"key": "value"}),
+        ('{"message": "Hello 世界"}', {"message": "Hello 世界"}),
+        ('{"message": "Hello 世界"}'.encode(), {"message": "Hello 世界"}),
+        ("[1, 2, 3]", [1, 2, 3]),
+        ("invalid json", None),
+        ("", None),
+    ],
+)
+def test_read_json(source: bytes | str, expected: Any) -> None:
+    assert read_json(source) == expected
 
 
-def test_read_json_empty() -> None:
-    result = read_json("")
-    assert result is None
+def test_endpoint_registry_match_ignores_query_string() -> None:
+    chat = EndpointSpec(name="chat.completions", suffixes=("/chat/completions",))
+    embeddings = EndpointSpec(name="embeddings", suffixes=("/embeddings",))
+    registry = EndpointRegistry(endpoints=(chat, embeddings))
 
-
-def test_read_json_list_payload() -> None:
-    result = read_json("[1, 2, 3]")
-    assert result == [1, 2, 3]
+    assert registry.match("/v1/embeddings?api-version=1") is embeddings
+    assert registry.match("/v1/chat/completions") is chat
+    assert registry.match("/v1/completions") is None
@@ -7,6 +7,7 @@ from typing import Any
 from src.openai_logger import (
     aggregate_streamed_response,
     is_event_stream,
+    iter_sse_events,
     parse_sse_events,
 )
 
@@ -15,13 +16,17 @@ def test_is_event_stream_is_case_insensitive() -> None:
     assert is_event_stream("Text/Event-Stream; charset=utf-8") is True
 
 
+def test_is_event_stream_rejects_json() -> None:
+    assert is_event_stream("application/json; charset=utf-8") is False
+
+
 def test_parse_sse_events_stops_on_done() -> None:
-    body = "\n".join(
+    body = b"\n".join(
         [
-            'data: {"id": "evt_1", "choices": []}',
-            "",
-            "data: [DONE]",
-            'data: {"id": "evt_2"}',
+            b'data: {"id": "evt_1", "choices": []}',
+            b"",
+            b"data: [DONE]",
+            b'data: {"id": "evt_2"}',
         ]
     )
 
@@ -31,12 +36,12 @@ def test_parse_sse_events_stops_on_done() -> None:
 
 
 def test_parse_sse_events_filters_invalid_payloads() -> None:
-    body = "\n".join(
+    body = b"\n".join(
         [
-            "event: ping",
-            "data:",
-            "data: not json",
-            "",
+            b"event: ping",
+            b"data:",
+            b"data: not json",
+            b"",
         ]
     )
 
@@ -45,6 +50,30 @@ def test_parse_sse_events_filters_invalid_payloads() -> None:
     assert events == []
 
 
+def test_parse_sse_events_keeps_only_aggregated_fields() -> None:
+    body = b"\n".join(
+        [
+            b"data: [1, 2]",
+            b'data: {"id": "evt_1", "object": "chat.completion.chunk", '
+            b'"choices": [{"index": 0, "delta": {"content": "x"}, "logprobs": null}]}',
+        ]
+    )
+
+    events = parse_sse_events(body)
+
+    assert events == [
+        {"id": "evt_1", "choices": [{"index": 0, "delta": {"content": "x"}}]}
+    ]
+
+
+def test_parse_sse_events_handles_crlf_and_missing_trailing_newline() -> None:
+    body = b'data: {"id": "evt_1"}\r\n\r\ndata: {"id": "evt_2"}'
+
+    events = parse_sse_events(body)
+
+    assert events == [{"id": "evt_1"}, {"id": "evt_2"}]
+
+
 def test_aggregate_streamed_response_empty() -> None:
     assert aggregate_streamed_response([]) is None
 
@@ -138,3 +167,54 @@ def test_aggregate_streamed_response_uses_last_usage() -> None:
 
     assert response is not None
     assert response["usage"] == {"total_tokens": 10}
+
+
+def test_aggregate_streamed_response_consumes_iterator() -> None:
+    body = b"\n\n".join(
+        [
+            b'data: {"id": "chatcmpl_4", "choices": [{"index": 0, "delta": {"content": "A"}}]}',
+            b'data: {"choices": [{"index": 0, "delta": {"content": "B"}}]}',
+            b"data: [DONE]",
+        ]
+    )
+
+    response = aggregate_streamed_response(iter_sse_events(body))
+
+    assert response is not None
+    assert response["id"] == "chatcmpl_4"
+    assert response["choices"][0]["message"]["content"] == "AB"
+
+
+def test_aggregate_streamed_response_hands_off_to_general_path() -> None:
+    events: list[dict[str, Any]] = [
+        {
+            "id": "chatcmpl_5",
+            "choices": [{"index": 0, "delta": {"role": "assistant", "content": "A"}}],
+        },
+        {
+            "choices": [
+                {"index": 0, "delta": {"content": "B"}},
+                {"index": 1, "delta": {"content": "C"}},
+            ],
+        },
+        {
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": {"tool_calls": [{"index": 0, "id": "call_1"}]},
+                    "finish_reason": "tool_calls",
+                }
+            ],
+        },
+    ]
+
+    response = aggregate_streamed_response(events)
+
+    assert response is not None
+    first, second = response["choices"]
+    assert first["message"]["role"] == "assistant"
+    assert first["message"]["content"] == "AB"
+    assert first["message"]["tool_calls"] == [{"id": "call_1"}]
+    assert first["finish_reason"] == "tool_calls"
+    assert second["index"] == 1
+    assert second["message"]["content"] == "C"
@@ -2,76 +2,222 @@
 
 from __future__ import annotations
 
+import os
+from collections.abc import Callable
 from pathlib import Path
+from typing import Any
 
 import orjson
 import pytest
+from mitmproxy.test import tflow
 
-from src.log_storage import StorageRouter, _safe_path_segment, append_jsonl
+from src.log_storage import (
+    StorageRouter,
+    _safe_path_segment,
+    _write_records,
+    append_jsonl,
+    append_jsonl_many,
+    flush_jsonl,
+)
 
 
-def test_append_jsonl_writes_single_object(tmp_path: Path) -> None:
-    path = tmp_path / "test.jsonl"
+def test_append_jsonl_writes_single_object(fast_tmp: Path) -> None:
+    path = fast_tmp / "single_object.jsonl"
     payload = {"key": "value"}
 
     append_jsonl(path, payload)
+    flush_jsonl()
 
-    content = path.read_bytes()
-    lines = content.strip().split(b"\n")
-    assert len(lines) == 1
-    assert orjson.loads(lines[0]) == payload
+    assert path.read_bytes().splitlines() == [orjson.dumps(payload)]
+
+
+def test_append_jsonl_roundtrip(fast_tmp: Path) -> None:
+    path = fast_tmp / "roundtrip.jsonl"
+    payload = {"text": "héllo", "nested": {"values": [1, 2.5, None, True]}}
+
+    append_jsonl(path, payload)
+    flush_jsonl()
+
+    lines = path.read_bytes().splitlines()
+    assert [orjson.loads(line) for line in lines] == [payload]
+
+
+def _append_each(path: Path, payloads: list[dict[str, Any]]) -> None:
+    for payload in payloads:
+        append_jsonl(path, payload)
 
 
-def test_append_jsonl_appends_multiple_objects(tmp_path: Path) -> None:
-    path = tmp_path / "test.jsonl"
+@pytest.mark.parametrize(
+    "append", [_append_each, append_jsonl_many], ids=["one-by-one", "many"]
+)
+def test_append_jsonl_appends_multiple_objects(
+    fast_tmp: Path,
+    append: Callable[[Path, list[dict[str, Any]]], None],
+) -> None:
+    path = fast_tmp / f"multiple_objects_{append.__name__.lstrip('_')}.jsonl"
     payloads = [
         {"id": 1, "name": "first"},
         {"id": 2, "name": "second"},
         {"id": 3, "name": "third"},
     ]
 
-    for payload in payloads:
-        append_jsonl(path, payload)
+    append(path, payloads)
+    flush_jsonl()
+
+    lines = path.read_bytes().splitlines()
+    assert lines == [orjson.dumps(payload) for payload in payloads]
+
+
+def test_append_jsonl_newline_option(fast_tmp: Path) -> None:
+    path = fast_tmp / "newline_option.jsonl"
+
+    for index in range(100):
+        append_jsonl(path, {"id": index, "text": "line"})
+    flush_jsonl()
 
     content = path.read_bytes()
-    lines = content.strip().split(b"\n")
-    assert len(lines) == 3
-    for index, line in enumerate(lines):
-        assert orjson.loads(line) == payloads[index]
+    assert content.count(b"\n") == 100
+    assert content.endswith(b"\n")
+
 
+def test_append_jsonl_serializes_numpy_arrays(fast_tmp: Path) -> None:
+    np = pytest.importorskip("numpy")
+    path = fast_tmp / "numpy_payload.jsonl"
 
-def test_append_jsonl_creates_parent_directory(tmp_path: Path) -> None:
-    path = tmp_path / "subdir" / "test.jsonl"
+    append_jsonl(path, {"embedding": np.array([0.5, 1.5])})
+    flush_jsonl()
+
+    assert path.read_bytes() == b'{"embedding":[0.5,1.5]}\n'
+
+
+def test_append_jsonl_many_single_write(
+    fast_tmp: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = fast_tmp / "many_objects.jsonl"
+    payloads = [{"id": index} for index in range(3)]
+    writev_calls: list[int] = []
+    real_writev = os.writev
+
+    def counting_writev(fd: int, buffers: list[bytes]) -> int:
+        writev_calls.append(len(buffers))
+        return real_writev(fd, buffers)
+
+    flush_jsonl()
+    monkeypatch.setattr("src.log_storage.os.writev", counting_writev)
+    append_jsonl_many(path, payloads)
+    flush_jsonl()
+
+    assert writev_calls == [1]
+    lines = path.read_bytes().splitlines()
+    assert [orjson.loads(line) for line in lines] == payloads
+
+
+def test_append_jsonl_creates_parent_directory(
+    fast_tmp: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = fast_tmp / "created_parent" / "test.jsonl"
     payload = {"key": "value"}
+    mkdir_calls: list[Path] = []
+    real_mkdir = Path.mkdir
+
+    def counting_mkdir(self: Path, *args: Any, **kwargs: Any) -> None:
+        mkdir_calls.append(self)
+        real_mkdir(self, *args, **kwargs)
 
+    monkeypatch.setattr(Path, "mkdir", counting_mkdir)
+    append_jsonl(path, payload)
+    flush_jsonl()
     append_jsonl(path, payload)
+    flush_jsonl()
 
     assert path.exists()
-    content = path.read_bytes()
-    lines = content.strip().split(b"\n")
-    assert orjson.loads(lines[0]) == payload
+    assert mkdir_calls == [path.parent]
+    lines = path.read_bytes().splitlines()
+    assert lines[0] == orjson.dumps(payload)
+
+
+def test_append_jsonl_reuses_fd(
+    fast_tmp: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = fast_tmp / "reused_fd.jsonl"
+    opened: list[Path] = []
+    real_open = os.open
+
+    def counting_open(file: Path, *args: Any) -> int:
+        opened.append(file)
+        return real_open(file, *args)
+
+    monkeypatch.setattr("src.log_storage.os.open", counting_open)
+    for index in range(5):
+        append_jsonl(path, {"id": index})
+        flush_jsonl()
+
+    assert opened == [path]
+    assert len(path.read_bytes().splitlines()) == 5
+
+
+def test_append_jsonl_reopens_removed_file(fast_tmp: Path) -> None:
+    path = fast_tmp / "removed_parent" / "test.jsonl"
+    append_jsonl(path, {"id": 1})
+    flush_jsonl()
+
+    path.unlink()
+    path.parent.rmdir()
+    append_jsonl(path, {"id": 2})
+    flush_jsonl()
+
+    lines = path.read_bytes().splitlines()
+    assert [orjson.loads(line) for line in lines] == [{"id": 2}]
+
+
+def test_write_records_splits_at_iov_limit(
+    fast_tmp: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = fast_tmp / "iov_limit.jsonl"
+    records = [b"%d\n" % index for index in range(5)]
+    monkeypatch.setattr("src.log_storage._IOV_MAX", 2)
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT)
+    try:
+        _write_records(fd, records)
+    finally:
+        os.close(fd)
+
+    assert path.read_bytes() == b"".join(records)
 
 
 def test_append_jsonl_handles_oserror(
-    tmp_path: Path, caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+    fast_tmp: Path, caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
 ) -> None:
-    path = tmp_path / "broken.jsonl"
+    path = fast_tmp / "broken.jsonl"
 
-    def raise_oserror(*_args: object, **_kwargs: object):
+    def raise_oserror(_path: Path) -> int:
         raise OSError("disk full")
 
-    monkeypatch.setattr(Path, "open", raise_oserror)
+    monkeypatch.setattr("src.log_storage._open_for_append", raise_oserror)
 
-    with caplog.at_level("WARNING"):
+    with caplog.at_level("WARNING", logger="src.log_storage"):
         append_jsonl(path, {"key": "value"})
+        flush_jsonl()
 
-    assert any("Failed to write JSONL" in record.message for record in caplog.records)
+    assert "Failed to write JSONL" in caplog.records[-1].message
 
 
 def test_safe_path_segment_sanitizes() -> None:
     assert _safe_path_segment("  Batch/1  ") == "Batch_1"
 
 
+def test_safe_path_segment_replaces_non_ascii_characters() -> None:
+    assert _safe_path_segment("批次-1") == "1"
+    assert _safe_path_segment("a批b") == "a_b"
+
+
+def test_safe_path_segment_never_yields_path_components() -> None:
+    assert _safe_path_segment("../..") == "unknown"
+    assert _safe_path_segment("a/../b") == "a_.._b"
+    assert _safe_path_segment("a\\b:c") == "a_b_c"
+
+
 def test_safe_path_segment_empty_falls_back_to_unknown() -> None:
     assert _safe_path_segment("  !!!  ") == "unknown"
 
@@ -81,6 +227,16 @@ def test_safe_path_segment_truncates_long_values() -> None:
     assert len(_safe_path_segment(value)) == 120
 
 
+@pytest.mark.usefixtures("clear_path_segment_cache")
+def test_safe_path_segment_is_cached() -> None:
+    for _ in range(1000):
+        _safe_path_segment("Batch 1")
+
+    info = _safe_path_segment.cache_info()
+    assert info.misses == 1
+    assert info.hits == 999
+
+
 def test_storage_router_with_header(tmp_path: Path, make_flow) -> None:
     flow = make_flow(request_headers={"x-batch-id": "Batch 1"})
     router = StorageRouter(tmp_path)
@@ -92,6 +248,41 @@ def test_storage_router_with_header(tmp_path: Path, make_flow) -> None:
     assert paths.output_path == base_dir / "output.jsonl"
 
 
+def test_storage_router_with_bytes_header(tmp_path: Path) -> None:
+    flow = tflow.tflow()
+    flow.request.headers["X-Batch-Id"] = "批次 1"
+    router = StorageRouter(tmp_path)
+
+    paths = router.resolve(flow)
+
+    assert paths.input_path == tmp_path / "requests" / "1" / "input.jsonl"
+
+
+def test_storage_router_resolve_does_not_touch_filesystem(
+    tmp_path: Path, make_flow, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def raise_on_filesystem_access(*_args: object, **_kwargs: object):
+        raise AssertionError("resolve() must not touch the filesystem")
+
+    for name in ("mkdir", "exists", "stat"):
+        monkeypatch.setattr(Path, name, raise_on_filesystem_access)
+    router = StorageRouter(tmp_path)
+
+    router.resolve(make_flow(request_headers={"x-batch-id": "Batch 1"}))
+    router.resolve(make_flow())
+
+
+def test_storage_router_reuses_paths_for_repeated_header(
+    tmp_path: Path, make_flow
+) -> None:
+    router = StorageRouter(tmp_path)
+
+    first = router.resolve(make_flow(request_headers={"x-batch-id": "Batch 1"}))
+    second = router.resolve(make_flow(request_headers={"x-batch-id": "Batch 1"}))
+
+    assert second is first
+
+
 def test_storage_router_without_header(tmp_path: Path, make_flow) -> None:
     flow = make_flow()
     router = StorageRouter(tmp_path)